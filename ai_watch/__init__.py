@@ -2,7 +2,9 @@ import os
 from pathlib import Path
 
 from flask import Flask
+from flask_compress import Compress
 
+from ai_watch.json_provider import OrjsonProvider
 from ai_watch.routes import register_routes
 from ai_watch.storage import FileDatabase
 
@@ -15,12 +17,17 @@ def create_app(db_path: str | None = None) -> Flask:
         template_folder=str(project_dir / "templates"),
         static_folder=str(project_dir / "static"),
     )
+    app.json = OrjsonProvider(app)
+    app.config["COMPRESS_MIMETYPES"] = ["application/json", "text/html"]
+    app.config["COMPRESS_MIN_SIZE"] = 512
+    Compress(app)
 
     env_db_path = os.getenv("AI_WATCH_DB_PATH")
     default_db = project_dir / "data" / "db.json"
     resolved_db_path = Path(db_path) if db_path else Path(env_db_path) if env_db_path else default_db
     app.logger.info("Using database file: %s", resolved_db_path)
-    storage = FileDatabase(resolved_db_path)
+    durable = os.getenv("AI_WATCH_NO_FSYNC") != "1"
+    storage = FileDatabase(resolved_db_path, durable=durable)
 
     app.config["DB"] = storage
     register_routes(app)
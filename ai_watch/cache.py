@@ -0,0 +1,32 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable
+
+
+class VersionedCache:
+    """Memoizes derived values until the database version changes, evicting least recently used."""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._version: Hashable | None = None
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+
+    def get_or_build(self, version: Hashable, key: Hashable, build: Callable[[], Any]) -> Any:
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._entries = OrderedDict()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        value = build()
+        with self._lock:
+            # Keys include raw query-string values, so cap the entry count.
+            if version == self._version:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
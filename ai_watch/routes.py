@@ -1,12 +1,47 @@
-import json
+import hashlib
+import math
 
-from flask import Flask, jsonify, redirect, render_template, request, url_for
+import orjson
+from flask import Flask, g, jsonify, redirect, render_template, request, url_for
 
+from ai_watch.cache import VersionedCache
 from ai_watch.validation import ALLOWED_CATEGORIES, ALLOWED_STATUSES, ValidationError
 
+_SORTED_CATEGORIES = sorted(ALLOWED_CATEGORIES)
+_SORTED_STATUSES = sorted(ALLOWED_STATUSES)
+_UNKNOWN_SERVICE = {"category": "general"}
+_CRUD_ARGS = (
+    "category",
+    "status",
+    "edit_service_id",
+    "edit_account_id",
+    "edit_budget_id",
+    "edit_recommendation_id",
+)
+_HEALTH_BODY = orjson.dumps({"status": "ok"})
+
 
 def _split_tags(raw_tags: str) -> list[str]:
-    return [tag.strip() for tag in raw_tags.split(",") if tag.strip()]
+    return [tag for tag in (part.strip() for part in raw_tags.split(",")) if tag]
+
+
+def _parse_json(raw: str | bytes):
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError as exc:
+        raise ValidationError(f"Invalid JSON: {exc.msg}") from exc
+
+
+def _json_body() -> dict:
+    # Parse the raw body directly so Werkzeug does not keep a second copy of it.
+    payload = _parse_json(request.get_data(cache=False))
+    if not isinstance(payload, dict):
+        raise ValidationError("Request body must be a JSON object.")
+    return payload
+
+
+def _optional_field(form, field: str) -> str | None:
+    return form.get(field, "").strip() or None
 
 
 def _parse_optional_int(raw_value: str) -> int | None:
@@ -21,53 +56,41 @@ def _parse_optional_int(raw_value: str) -> int | None:
 
 def _parse_float(raw_value: str) -> float:
     try:
-        return float(raw_value)
+        value = float(raw_value)
     except ValueError as exc:
         raise ValidationError("Expected a numeric value.") from exc
+    if not math.isfinite(value):
+        raise ValidationError("Expected a finite numeric value.")
+    return value
 
 
 def _view_data(db, category_filter: str | None = None, status_filter: str | None = None) -> dict:
-    config = db.get_config()
-    summary = db.dashboard_summary()
+    snapshot = db.snapshot()
+    config = snapshot.config
+    service_by_id = snapshot.service_by_id
 
     services = config["services"]
     accounts_all = config["accounts"]
-    account_by_id = {acc["id"]: acc for acc in accounts_all}
-    service_by_id = {svc["id"]: svc for svc in services}
-
-    accounts = []
-    for account in accounts_all:
-        service = service_by_id.get(account["service_id"], {})
-        category = service.get("category", "general")
-        if category_filter and category != category_filter:
-            continue
-        if status_filter and account["status"] != status_filter:
-            continue
-        accounts.append(
-            {
-                **account,
-                "service_name": service.get("name", account["service_id"]),
-                "category": category,
-            }
-        )
 
-    budgets = []
-    for budget in config["usage_budgets"]:
-        account = account_by_id.get(budget["account_id"], {})
-        budgets.append(
-            {
-                **budget,
-                "account_email": account.get("email", budget["account_id"]),
-            }
-        )
+    accounts = accounts_all
+    if status_filter:
+        accounts = [acc for acc in accounts if acc["status"] == status_filter]
+    if category_filter:
+        accounts = [
+            acc
+            for acc in accounts
+            if service_by_id.get(acc["service_id"], _UNKNOWN_SERVICE)["category"] == category_filter
+        ]
 
     recommendations = db.list_recommendations()
 
     return {
-        "summary": summary,
+        "summary": snapshot.summary,
         "services": services,
         "accounts": accounts,
-        "budgets": budgets,
+        "budgets": config["usage_budgets"],
+        "service_by_id": service_by_id,
+        "account_by_id": snapshot.account_by_id,
         "recommendations": recommendations,
         "counts": {
             "services": len(services),
@@ -79,150 +102,207 @@ def _view_data(db, category_filter: str | None = None, status_filter: str | None
 
 
 def register_routes(app: Flask) -> None:
+    db = app.config["DB"]
+    cache = VersionedCache()
+
+    def cached(key: tuple, build):
+        return cache.get_or_build(db.version(), key, build)
+
+    page_cache = VersionedCache()
+
+    def cached_page(key: tuple, render) -> str:
+        # Pages are a pure function of the database and the key, which must cover every input
+        # the page reads and nothing else, so junk query args cannot churn the cache.
+        return page_cache.get_or_build(db.version(), key, render)
+
+    def cached_view_data(category_filter: str | None = None, status_filter: str | None = None) -> dict:
+        return cached(
+            ("view", category_filter, status_filter),
+            lambda: _view_data(db, category_filter=category_filter, status_filter=status_filter),
+        )
+
+    def is_conditional_api_get() -> bool:
+        return (
+            request.method in ("GET", "HEAD")
+            and request.path.startswith("/api/")
+            and request.path != "/api/health"
+        )
+
+    @app.before_request
+    def _check_api_etag():
+        if not is_conditional_api_get():
+            return None
+        # Tag with the version seen before the body is built, so a write that lands
+        # mid-request can only make the tag older than the body, never newer.
+        # Use the file identity, not the per-process version, so every worker tags alike.
+        g.api_etag = hashlib.sha1(repr((db.file_version(), request.full_path)).encode()).hexdigest()
+        # Flask-Compress appends ":<encoding>" to the tags of compressed responses;
+        # match on the base tag and echo back exactly what the client sent.
+        for client_tag in request.if_none_match.as_set():
+            if client_tag.partition(":")[0] == g.api_etag:
+                response = app.response_class(status=304)
+                response.set_etag(client_tag)
+                return response
+        return None
+
+    @app.after_request
+    def _set_api_etag(response):
+        if response.status_code == 200 and "api_etag" in g:
+            response.set_etag(g.api_etag)
+        return response
+
     @app.errorhandler(ValidationError)
     def _handle_validation(error: ValidationError):
         return jsonify({"error": str(error)}), 400
 
     @app.route("/api/health", methods=["GET"])
-    def health() -> tuple[dict, int]:
-        return {"status": "ok"}, 200
+    def health():
+        # A fresh Response per call: after_request hooks may still add headers to it.
+        return app.response_class(_HEALTH_BODY, status=200, mimetype="application/json")
 
     @app.route("/api/config", methods=["GET"])
     def get_config():
-        return jsonify(app.config["DB"].get_config())
+        return jsonify(cached(("config",), db.get_config))
 
     @app.route("/api/dashboard", methods=["GET"])
     def dashboard():
-        return jsonify(app.config["DB"].dashboard_summary())
+        return jsonify(cached(("dashboard",), db.dashboard_summary))
 
     @app.route("/api/services", methods=["GET"])
     def list_services():
         category = request.args.get("category")
-        return jsonify(app.config["DB"].list_services(category=category))
+        return jsonify(
+            cached(("services", category), lambda: db.list_services(category=category))
+        )
 
     @app.route("/api/services/<service_id>", methods=["GET"])
     def get_service(service_id: str):
-        service = app.config["DB"].get_service(service_id)
+        service = db.get_service(service_id)
         if not service:
             return jsonify({"error": "Service not found."}), 404
         return jsonify(service)
 
     @app.route("/api/services", methods=["POST"])
     def create_service():
-        payload = request.get_json(force=True)
-        created = app.config["DB"].create_service(payload)
+        payload = _json_body()
+        created = db.create_service(payload)
         return jsonify(created), 201
 
     @app.route("/api/services/<service_id>", methods=["PUT"])
     def update_service(service_id: str):
-        payload = request.get_json(force=True)
-        updated = app.config["DB"].update_service(service_id, payload)
+        payload = _json_body()
+        updated = db.update_service(service_id, payload)
         return jsonify(updated)
 
     @app.route("/api/services/<service_id>", methods=["DELETE"])
     def delete_service(service_id: str):
-        app.config["DB"].delete_service(service_id)
+        db.delete_service(service_id)
         return "", 204
 
     @app.route("/api/accounts", methods=["GET"])
     def list_accounts():
         category = request.args.get("category")
         status = request.args.get("status")
-        return jsonify(app.config["DB"].list_accounts(category=category, status=status))
+        return jsonify(
+            cached(
+                ("accounts", category, status),
+                lambda: db.list_accounts(category=category, status=status),
+            )
+        )
 
     @app.route("/api/accounts/<account_id>", methods=["GET"])
     def get_account(account_id: str):
-        account = app.config["DB"].get_account(account_id)
+        account = db.get_account(account_id)
         if not account:
             return jsonify({"error": "Account not found."}), 404
         return jsonify(account)
 
     @app.route("/api/accounts", methods=["POST"])
     def create_account():
-        payload = request.get_json(force=True)
-        created = app.config["DB"].create_account(payload)
+        payload = _json_body()
+        created = db.create_account(payload)
         return jsonify(created), 201
 
     @app.route("/api/accounts/<account_id>", methods=["PUT"])
     def update_account(account_id: str):
-        payload = request.get_json(force=True)
-        updated = app.config["DB"].update_account(account_id, payload)
+        payload = _json_body()
+        updated = db.update_account(account_id, payload)
         return jsonify(updated)
 
     @app.route("/api/accounts/<account_id>", methods=["DELETE"])
     def delete_account(account_id: str):
-        app.config["DB"].delete_account(account_id)
+        db.delete_account(account_id)
         return "", 204
 
     @app.route("/api/budgets", methods=["GET"])
     def list_budgets():
-        return jsonify(app.config["DB"].list_budgets())
+        return jsonify(cached(("budgets",), db.list_budgets))
 
     @app.route("/api/budgets/<budget_id>", methods=["GET"])
     def get_budget(budget_id: str):
-        budget = app.config["DB"].get_budget(budget_id)
+        budget = db.get_budget(budget_id)
         if not budget:
             return jsonify({"error": "Budget not found."}), 404
         return jsonify(budget)
 
     @app.route("/api/budgets", methods=["POST"])
     def create_budget():
-        payload = request.get_json(force=True)
-        created = app.config["DB"].create_budget(payload)
+        payload = _json_body()
+        created = db.create_budget(payload)
         return jsonify(created), 201
 
     @app.route("/api/budgets/<budget_id>", methods=["PUT"])
     def update_budget(budget_id: str):
-        payload = request.get_json(force=True)
-        updated = app.config["DB"].update_budget(budget_id, payload)
+        payload = _json_body()
+        updated = db.update_budget(budget_id, payload)
         return jsonify(updated)
 
     @app.route("/api/budgets/<budget_id>", methods=["DELETE"])
     def delete_budget(budget_id: str):
-        app.config["DB"].delete_budget(budget_id)
+        db.delete_budget(budget_id)
         return "", 204
 
     @app.route("/api/recommendations", methods=["GET"])
     def list_recommendations():
-        return jsonify(app.config["DB"].list_recommendations())
+        return jsonify(cached(("recommendations",), db.list_recommendations))
 
     @app.route("/api/recommendations/<recommendation_id>", methods=["GET"])
     def get_recommendation(recommendation_id: str):
-        recommendation = app.config["DB"].get_recommendation(recommendation_id)
+        recommendation = db.get_recommendation(recommendation_id)
         if not recommendation:
             return jsonify({"error": "Recommendation not found."}), 404
         return jsonify(recommendation)
 
     @app.route("/api/recommendations", methods=["POST"])
     def create_recommendation():
-        payload = request.get_json(force=True)
-        created = app.config["DB"].create_recommendation(payload)
+        payload = _json_body()
+        created = db.create_recommendation(payload)
         return jsonify(created), 201
 
     @app.route("/api/recommendations/<recommendation_id>", methods=["PUT"])
     def update_recommendation(recommendation_id: str):
-        payload = request.get_json(force=True)
-        updated = app.config["DB"].update_recommendation(recommendation_id, payload)
+        payload = _json_body()
+        updated = db.update_recommendation(recommendation_id, payload)
         return jsonify(updated)
 
     @app.route("/api/recommendations/<recommendation_id>", methods=["DELETE"])
     def delete_recommendation(recommendation_id: str):
-        app.config["DB"].delete_recommendation(recommendation_id)
+        db.delete_recommendation(recommendation_id)
         return "", 204
 
     @app.route("/services/save", methods=["POST"])
     def web_save_service():
-        db = app.config["DB"]
+        form = request.form
         payload = {
-            "id": request.form["id"].strip(),
-            "name": request.form["name"].strip(),
-            "category": request.form["category"].strip(),
-            "provider": request.form["provider"].strip(),
-            "website_url": request.form["website_url"].strip(),
-            "docs_url": request.form.get("docs_url", "").strip() or None,
-            "billing_url": request.form.get("billing_url", "").strip() or None,
+            "id": form["id"].strip(),
+            "name": form["name"].strip(),
+            "category": form["category"].strip(),
+            "provider": form["provider"].strip(),
+            "website_url": form["website_url"].strip(),
+            "docs_url": _optional_field(form, "docs_url"),
+            "billing_url": _optional_field(form, "billing_url"),
         }
-        edit_id = request.form.get("edit_id", "").strip()
+        edit_id = form.get("edit_id", "").strip()
         if edit_id:
             db.update_service(edit_id, payload)
         else:
@@ -231,19 +311,19 @@ def register_routes(app: Flask) -> None:
 
     @app.route("/accounts/save", methods=["POST"])
     def web_save_account():
-        db = app.config["DB"]
+        form = request.form
         payload = {
-            "id": request.form["id"].strip(),
-            "service_id": request.form["service_id"].strip(),
-            "email": request.form["email"].strip(),
-            "plan_name": request.form["plan_name"].strip(),
-            "monthly_cost_usd": _parse_float(request.form["monthly_cost_usd"]),
-            "renewal_day": _parse_optional_int(request.form.get("renewal_day", "")),
-            "status": request.form["status"].strip(),
-            "notes": request.form.get("notes", "").strip(),
-            "tags": _split_tags(request.form.get("tags", "")),
+            "id": form["id"].strip(),
+            "service_id": form["service_id"].strip(),
+            "email": form["email"].strip(),
+            "plan_name": form["plan_name"].strip(),
+            "monthly_cost_usd": _parse_float(form["monthly_cost_usd"]),
+            "renewal_day": _parse_optional_int(form.get("renewal_day", "")),
+            "status": form["status"].strip(),
+            "notes": form.get("notes", "").strip(),
+            "tags": _split_tags(form.get("tags", "")),
         }
-        edit_id = request.form.get("edit_id", "").strip()
+        edit_id = form.get("edit_id", "").strip()
         if edit_id:
             db.update_account(edit_id, payload)
         else:
@@ -252,15 +332,15 @@ def register_routes(app: Flask) -> None:
 
     @app.route("/budgets/save", methods=["POST"])
     def web_save_budget():
-        db = app.config["DB"]
+        form = request.form
         payload = {
-            "id": request.form["id"].strip(),
-            "account_id": request.form["account_id"].strip(),
-            "monthly_budget_usd": _parse_float(request.form["monthly_budget_usd"]),
-            "alert_threshold_percent": _parse_float(request.form["alert_threshold_percent"]),
-            "current_month_spend_usd": _parse_float(request.form["current_month_spend_usd"]),
+            "id": form["id"].strip(),
+            "account_id": form["account_id"].strip(),
+            "monthly_budget_usd": _parse_float(form["monthly_budget_usd"]),
+            "alert_threshold_percent": _parse_float(form["alert_threshold_percent"]),
+            "current_month_spend_usd": _parse_float(form["current_month_spend_usd"]),
         }
-        edit_id = request.form.get("edit_id", "").strip()
+        edit_id = form.get("edit_id", "").strip()
         if edit_id:
             db.update_budget(edit_id, payload)
         else:
@@ -269,18 +349,16 @@ def register_routes(app: Flask) -> None:
 
     @app.route("/recommendations/save", methods=["POST"])
     def web_save_recommendation():
-        db = app.config["DB"]
-        account_id = request.form.get("account_id", "").strip() or None
-        service_id = request.form.get("service_id", "").strip() or None
+        form = request.form
         payload = {
-            "id": request.form["id"].strip(),
-            "account_id": account_id,
-            "service_id": service_id,
-            "title": request.form["title"].strip(),
-            "body": request.form["body"].strip(),
-            "priority": int(request.form["priority"].strip()),
+            "id": form["id"].strip(),
+            "account_id": _optional_field(form, "account_id"),
+            "service_id": _optional_field(form, "service_id"),
+            "title": form["title"].strip(),
+            "body": form["body"].strip(),
+            "priority": int(form["priority"].strip()),
         }
-        edit_id = request.form.get("edit_id", "").strip()
+        edit_id = form.get("edit_id", "").strip()
         if edit_id:
             db.update_recommendation(edit_id, payload)
         else:
@@ -289,48 +367,45 @@ def register_routes(app: Flask) -> None:
 
     @app.route("/services/delete/<service_id>", methods=["POST"])
     def web_delete_service(service_id: str):
-        app.config["DB"].delete_service(service_id)
+        db.delete_service(service_id)
         return redirect(url_for("crud"))
 
     @app.route("/accounts/delete/<account_id>", methods=["POST"])
     def web_delete_account(account_id: str):
-        app.config["DB"].delete_account(account_id)
+        db.delete_account(account_id)
         return redirect(url_for("crud"))
 
     @app.route("/budgets/delete/<budget_id>", methods=["POST"])
     def web_delete_budget(budget_id: str):
-        app.config["DB"].delete_budget(budget_id)
+        db.delete_budget(budget_id)
         return redirect(url_for("crud"))
 
     @app.route("/recommendations/delete/<recommendation_id>", methods=["POST"])
     def web_delete_recommendation(recommendation_id: str):
-        app.config["DB"].delete_recommendation(recommendation_id)
+        db.delete_recommendation(recommendation_id)
         return redirect(url_for("crud"))
 
     @app.route("/config/import", methods=["POST"])
     def web_import_config():
-        raw_json = request.form.get("config_json", "").strip()
-        if not raw_json:
+        raw_json = request.form.get("config_json", "")
+        if not raw_json or raw_json.isspace():
             raise ValidationError("Import JSON cannot be empty.")
-        try:
-            payload = json.loads(raw_json)
-        except json.JSONDecodeError as exc:
-            raise ValidationError(f"Invalid JSON: {exc.msg}") from exc
-        app.config["DB"].replace_config(payload)
+        payload = _parse_json(raw_json)
+        db.replace_config(payload)
         return redirect(url_for("home"))
 
     @app.route("/", methods=["GET"])
     def home():
-        db = app.config["DB"]
-        data = _view_data(db)
-        return render_template("home.html", **data)
+        return cached_page(("home",), lambda: render_template("home.html", **cached_view_data()))
 
     @app.route("/crud", methods=["GET"])
     def crud():
-        db = app.config["DB"]
+        return cached_page(("crud", *(request.args.get(name) for name in _CRUD_ARGS)), render_crud)
+
+    def render_crud() -> str:
         category_filter = request.args.get("category") or None
         status_filter = request.args.get("status") or None
-        data = _view_data(db, category_filter=category_filter, status_filter=status_filter)
+        data = cached_view_data(category_filter=category_filter, status_filter=status_filter)
 
         edit_service_id = request.args.get("edit_service_id")
         edit_account_id = request.args.get("edit_account_id")
@@ -351,8 +426,15 @@ def register_routes(app: Flask) -> None:
             account_form=account_form,
             budget_form=budget_form,
             recommendation_form=recommendation_form,
-            categories=sorted(ALLOWED_CATEGORIES),
-            statuses=sorted(ALLOWED_STATUSES),
+            categories=_SORTED_CATEGORIES,
+            statuses=_SORTED_STATUSES,
             selected_category=category_filter or "",
             selected_status=status_filter or "",
         )
+
+    # Build the unfiltered view once at startup so the first page load is not cold.
+    try:
+        cached_view_data()
+    except Exception:
+        # A malformed database should break the pages that read it, not the deploy.
+        app.logger.exception("Could not pre-warm view cache")
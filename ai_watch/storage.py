@@ -1,9 +1,14 @@
 import json
 import os
+from contextlib import contextmanager
 from pathlib import Path
 from tempfile import NamedTemporaryFile
-from threading import Lock
+from threading import Lock, RLock
+from typing import NamedTuple
 
+import orjson
+
+from ai_watch.cache import VersionedCache
 from ai_watch.validation import (
     ValidationError,
     validate_account_payload,
@@ -16,40 +21,245 @@ from ai_watch.validation import (
 DEFAULT_DB = {"services": [], "accounts": [], "usage_budgets": [], "recommendations": []}
 
 
+def _replace_record(records: list[dict], record_id: str, payload: dict) -> dict | None:
+    """Swap the record with ``record_id`` for an updated copy so cached records stay untouched."""
+    for index, record in enumerate(records):
+        if record["id"] == record_id:
+            records[index] = {**record, **payload}
+            return records[index]
+    return None
+
+
+def _remove_record(records: list[dict], record_id: str) -> bool:
+    """Delete every record with ``record_id`` in place; a hand-edited file may repeat an id."""
+    kept = [record for record in records if record["id"] != record_id]
+    if len(kept) == len(records):
+        return False
+    records[:] = kept
+    return True
+
+
+def _summarize(data: dict, service_by_id: dict[str, dict], budget_by_account_id: dict[str, dict]) -> dict:
+    total = 0.0
+    breakdown = {"coding": 0.0, "art": 0.0, "music": 0.0, "general": 0.0}
+    budget_alerts = []
+    for account in data["accounts"]:
+        if account["status"] != "active":
+            continue
+        cost = account["monthly_cost_usd"]
+        total += cost
+        service = service_by_id.get(account["service_id"])
+        breakdown[service["category"] if service else "general"] += cost
+        budget = budget_by_account_id.get(account["id"])
+        if budget and budget["monthly_budget_usd"] > 0:
+            percent = round((budget["current_month_spend_usd"] / budget["monthly_budget_usd"]) * 100, 2)
+            if percent >= budget["alert_threshold_percent"]:
+                budget_alerts.append(
+                    {
+                        "account_id": account["id"],
+                        "email": account["email"],
+                        "percent_used": percent,
+                    }
+                )
+    breakdown = {key: round(value, 2) for key, value in breakdown.items()}
+    return {
+        "total_monthly_spend_usd": round(total, 2),
+        "category_breakdown_usd": breakdown,
+        "budget_alerts": budget_alerts,
+    }
+
+
+class Snapshot(NamedTuple):
+    config: dict
+    summary: dict
+    service_by_id: dict[str, dict]
+    account_by_id: dict[str, dict]
+    budget_by_id: dict[str, dict]
+    budget_by_account_id: dict[str, dict]
+    recommendation_by_id: dict[str, dict]
+    accounts_by_filter: dict[tuple[str | None, str | None], list[dict]]
+    recommendations_by_priority: list[dict]
+
+
+def _bucket_accounts(
+    accounts: list[dict], service_by_id: dict[str, dict]
+) -> dict[tuple[str | None, str | None], list[dict]]:
+    """Group accounts under every (category, status) filter combination list_accounts accepts."""
+    buckets: dict[tuple[str | None, str | None], list[dict]] = {(None, None): accounts}
+    for account in accounts:
+        status = account["status"]
+        keys = [(None, status)]
+        service = service_by_id.get(account["service_id"])
+        if service is not None:
+            keys += [(service["category"], None), (service["category"], status)]
+        for key in keys:
+            buckets.setdefault(key, []).append(account)
+    return buckets
+
+
+def _build_snapshot(data: dict) -> Snapshot:
+    service_by_id = {svc["id"]: svc for svc in data["services"]}
+    budget_by_account_id = {budget["account_id"]: budget for budget in data["usage_budgets"]}
+    return Snapshot(
+        config=data,
+        summary=_summarize(data, service_by_id, budget_by_account_id),
+        service_by_id=service_by_id,
+        account_by_id={acc["id"]: acc for acc in data["accounts"]},
+        budget_by_id={budget["id"]: budget for budget in data["usage_budgets"]},
+        budget_by_account_id=budget_by_account_id,
+        recommendation_by_id={rec["id"]: rec for rec in data["recommendations"]},
+        accounts_by_filter=_bucket_accounts(data["accounts"], service_by_id),
+        recommendations_by_priority=sorted(data["recommendations"], key=lambda rec: rec["priority"]),
+    )
+
+
 class FileDatabase:
-    def __init__(self, path: Path):
+    def __init__(self, path: Path, *, durable: bool = True):
         self.path = path
+        self.durable = durable
         self._lock = Lock()
+        self._write_lock = RLock()
+        self._pending: dict | None = None
+        self._generation = 0
+        self._legacy_constants = False
+        self._cache: tuple[tuple[int, int, int], dict] | None = None
+        self._derived = VersionedCache()
         self._ensure_exists()
 
     def _ensure_exists(self) -> None:
         self.path.parent.mkdir(parents=True, exist_ok=True)
         if not self.path.exists():
-            self._write(DEFAULT_DB)
+            self._write({key: [] for key in DEFAULT_DB})
 
     def _read(self) -> dict:
+        """Return the parsed database, re-reading the file only when it has changed.
+
+        The returned dict is shared with later callers and must not be mutated;
+        use _read_for_update() to get a copy that can be modified and written.
+        """
+        cached = self._cache
+        file_key = self._file_key()
+        if cached is not None and cached[0] == file_key:
+            return cached[1]
+        # Only a reload takes the lock, so concurrent readers of an unchanged file
+        # never wait on each other or on a writer's fsync.
         with self._lock:
-            with self.path.open("r", encoding="utf-8") as handle:
-                data = json.load(handle)
-        if "services" not in data or "accounts" not in data:
-            raise ValidationError("Invalid database format.")
-        data.setdefault("usage_budgets", [])
-        data.setdefault("recommendations", [])
+            file_key = self._file_key()
+            cached = self._cache
+            if cached is not None and cached[0] == file_key:
+                return cached[1]
+            raw = self.path.read_bytes()
+            try:
+                data = orjson.loads(raw)
+                self._legacy_constants = False
+            except orjson.JSONDecodeError:
+                # Older versions wrote NaN/Infinity with stdlib json; orjson rejects them.
+                data = json.loads(raw)
+                self._legacy_constants = True
+            if "services" not in data or "accounts" not in data:
+                raise ValidationError("Invalid database format.")
+            data.setdefault("usage_budgets", [])
+            data.setdefault("recommendations", [])
+            self._cache = (file_key, data)
+            return data
+
+    def _file_key(self) -> tuple[int, int, int]:
+        stat = self.path.stat()
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _read_for_update(self) -> dict:
+        # Copy only the collections mutators touch; any other top-level keys pass through as-is.
+        data = dict(self._read())
+        for key in DEFAULT_DB:
+            data[key] = list(data[key])
         return data
 
+    @contextmanager
+    def _mutation(self):
+        """Yield a writable copy of the database and write it back when the block exits."""
+        with self._write_lock:
+            if self._pending is not None:
+                yield self._pending
+                return
+            # Work from the raw data, not snapshot(): a malformed record must not block the
+            # writes (import, delete) that would repair it.
+            data = self._read_for_update()
+            yield data
+            self._write(data)
+
+    @staticmethod
+    def _known_ids(data: dict, key: str) -> set:
+        return {record.get("id") for record in data[key]}
+
+    @staticmethod
+    def _budgeted_account_ids(data: dict) -> set:
+        return {budget.get("account_id") for budget in data["usage_budgets"]}
+
+    @contextmanager
+    def batch(self):
+        """Group several mutations into a single file write.
+
+        Mutations inside the block are applied to an in-memory copy that is written
+        once on exit. If the block raises, none of them are written. Reads inside the
+        block still see the last written state.
+        """
+        with self._write_lock:
+            if self._pending is not None:
+                yield
+                return
+            self._pending = self._read_for_update()
+            try:
+                yield
+                pending = self._pending
+            finally:
+                self._pending = None
+            self._write(pending)
+
     def _write(self, data: dict) -> None:
-        with self._lock:
-            with NamedTemporaryFile(
-                mode="w",
-                encoding="utf-8",
+        """Atomically replace the database file: write a temp file, fsync it, then rename.
+
+        With durable=False the fsync is skipped. The rename is still atomic, but a
+        power loss may lose the most recent writes.
+        """
+        with self._write_lock:
+            tmp = NamedTemporaryFile(
+                mode="wb",
                 delete=False,
                 dir=str(self.path.parent),
-            ) as tmp:
-                json.dump(data, tmp, indent=2)
-                tmp.flush()
-                os.fsync(tmp.fileno())
-                temp_path = tmp.name
-            os.replace(temp_path, self.path)
+                prefix=f".{self.path.name}.",
+                suffix=".tmp",
+            )
+            try:
+                with tmp:
+                    if self._legacy_constants:
+                        # orjson would silently turn NaN/Infinity into null; keep them as they were read.
+                        tmp.write(json.dumps(data, indent=2).encode("utf-8"))
+                    else:
+                        tmp.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+                    tmp.flush()
+                    if self.durable:
+                        os.fsync(tmp.fileno())
+                    # Key the cache on the file we wrote; rename keeps inode, mtime and size,
+                    # so a concurrent replace by another process cannot be mistaken for ours.
+                    stat = os.fstat(tmp.fileno())
+                os.replace(tmp.name, self.path)
+            except BaseException:
+                Path(tmp.name).unlink(missing_ok=True)
+                raise
+            self._cache = ((stat.st_ino, stat.st_mtime_ns, stat.st_size), data)
+            self._generation += 1
+
+    def file_version(self) -> tuple[int, int, int]:
+        """Return the database file's (inode, mtime, size), which every process sees the same."""
+        return self._file_key()
+
+    def version(self) -> tuple[int, int, int, int]:
+        """Return a token that changes whenever the database file is rewritten."""
+        return (self._generation, *self._file_key())
+
+    def snapshot(self) -> Snapshot:
+        """Return the config with its summary and id indexes, built once per database version."""
+        return self._derived.get_or_build(self.version(), "snapshot", lambda: _build_snapshot(self._read()))
 
     def get_config(self) -> dict:
         return self._read()
@@ -85,7 +295,7 @@ class FileDatabase:
         account_ids: set[str] = set()
         validated_accounts: list[dict] = []
         for account in accounts:
-            validate_account_payload(account, validated_services)
+            validate_account_payload(account, service_ids)
             account_id = account["id"]
             if account_id in account_ids:
                 raise ValidationError(f"Duplicate account ID '{account_id}'.")
@@ -96,7 +306,7 @@ class FileDatabase:
         budget_account_ids: set[str] = set()
         validated_budgets: list[dict] = []
         for budget in usage_budgets:
-            validate_budget_payload(budget, validated_accounts)
+            validate_budget_payload(budget, account_ids)
             budget_id = budget["id"]
             account_id = budget["account_id"]
             if budget_id in budget_ids:
@@ -110,21 +320,22 @@ class FileDatabase:
         recommendation_ids: set[str] = set()
         validated_recommendations: list[dict] = []
         for recommendation in recommendations:
-            validate_recommendation_payload(recommendation, validated_accounts, validated_services)
+            validate_recommendation_payload(recommendation, account_ids, service_ids)
             recommendation_id = recommendation["id"]
             if recommendation_id in recommendation_ids:
                 raise ValidationError(f"Duplicate recommendation ID '{recommendation_id}'.")
             recommendation_ids.add(recommendation_id)
             validated_recommendations.append(dict(recommendation))
 
-        data = {
+        config = {
             "services": validated_services,
             "accounts": validated_accounts,
             "usage_budgets": validated_budgets,
             "recommendations": validated_recommendations,
         }
-        self._write(data)
-        return data
+        with self._mutation() as data:
+            data.update(config)
+        return config
 
     def list_services(self, category: str | None = None) -> list[dict]:
         services = self._read()["services"]
@@ -133,197 +344,145 @@ class FileDatabase:
         return services
 
     def get_service(self, service_id: str) -> dict | None:
-        services = self._read()["services"]
-        return next((svc for svc in services if svc["id"] == service_id), None)
+        return self.snapshot().service_by_id.get(service_id)
 
     def create_service(self, payload: dict) -> dict:
         validate_service_payload(payload)
-        data = self._read()
-        if any(svc["id"] == payload["id"] for svc in data["services"]):
-            raise ValidationError(f"Service '{payload['id']}' already exists.")
-        data["services"].append(payload)
-        self._write(data)
-        return payload
+        with self._mutation() as data:
+            if payload["id"] in self._known_ids(data, "services"):
+                raise ValidationError(f"Service '{payload['id']}' already exists.")
+            record = dict(payload)
+            data["services"].append(record)
+        return record
 
     def update_service(self, service_id: str, payload: dict) -> dict:
         validate_service_payload(payload)
         if payload["id"] != service_id:
             raise ValidationError("Service ID in path and payload must match.")
-        data = self._read()
-        service = next((svc for svc in data["services"] if svc["id"] == service_id), None)
-        if not service:
-            raise ValidationError(f"Service '{service_id}' was not found.")
-        service.update(payload)
-        self._write(data)
+        with self._mutation() as data:
+            service = _replace_record(data["services"], service_id, payload)
+            if not service:
+                raise ValidationError(f"Service '{service_id}' was not found.")
         return service
 
     def delete_service(self, service_id: str) -> None:
-        data = self._read()
-        if any(acc["service_id"] == service_id for acc in data["accounts"]):
-            raise ValidationError("Cannot delete a service used by an account.")
-        before = len(data["services"])
-        data["services"] = [svc for svc in data["services"] if svc["id"] != service_id]
-        if len(data["services"]) == before:
-            raise ValidationError(f"Service '{service_id}' was not found.")
-        self._write(data)
+        with self._mutation() as data:
+            if any(acc["service_id"] == service_id for acc in data["accounts"]):
+                raise ValidationError("Cannot delete a service used by an account.")
+            if not _remove_record(data["services"], service_id):
+                raise ValidationError(f"Service '{service_id}' was not found.")
 
     def list_accounts(self, category: str | None = None, status: str | None = None) -> list[dict]:
-        data = self._read()
-        services = {svc["id"]: svc for svc in data["services"]}
-        accounts = data["accounts"]
-        if status:
-            accounts = [acc for acc in accounts if acc["status"] == status]
-        if category:
-            accounts = [
-                acc for acc in accounts if services.get(acc["service_id"], {}).get("category") == category
-            ]
-        return accounts
+        key = (category or None, status or None)
+        return self.snapshot().accounts_by_filter.get(key, [])
 
     def get_account(self, account_id: str) -> dict | None:
-        accounts = self._read()["accounts"]
-        return next((acc for acc in accounts if acc["id"] == account_id), None)
+        return self.snapshot().account_by_id.get(account_id)
 
     def create_account(self, payload: dict) -> dict:
-        data = self._read()
-        validate_account_payload(payload, data["services"])
-        if any(acc["id"] == payload["id"] for acc in data["accounts"]):
-            raise ValidationError(f"Account '{payload['id']}' already exists.")
-        data["accounts"].append(payload)
-        self._write(data)
-        return payload
+        with self._mutation() as data:
+            validate_account_payload(payload, self._known_ids(data, "services"))
+            if payload["id"] in self._known_ids(data, "accounts"):
+                raise ValidationError(f"Account '{payload['id']}' already exists.")
+            record = dict(payload)
+            data["accounts"].append(record)
+        return record
 
     def update_account(self, account_id: str, payload: dict) -> dict:
-        data = self._read()
-        validate_account_payload(payload, data["services"])
-        if payload["id"] != account_id:
-            raise ValidationError("Account ID in path and payload must match.")
-        account = next((acc for acc in data["accounts"] if acc["id"] == account_id), None)
-        if not account:
-            raise ValidationError(f"Account '{account_id}' was not found.")
-        account.update(payload)
-        self._write(data)
+        with self._mutation() as data:
+            validate_account_payload(payload, self._known_ids(data, "services"))
+            if payload["id"] != account_id:
+                raise ValidationError("Account ID in path and payload must match.")
+            account = _replace_record(data["accounts"], account_id, payload)
+            if not account:
+                raise ValidationError(f"Account '{account_id}' was not found.")
         return account
 
     def delete_account(self, account_id: str) -> None:
-        data = self._read()
-        before = len(data["accounts"])
-        data["accounts"] = [acc for acc in data["accounts"] if acc["id"] != account_id]
-        if len(data["accounts"]) == before:
-            raise ValidationError(f"Account '{account_id}' was not found.")
-        data["usage_budgets"] = [budget for budget in data["usage_budgets"] if budget["account_id"] != account_id]
-        data["recommendations"] = [
-            rec for rec in data["recommendations"] if rec.get("account_id") != account_id
-        ]
-        self._write(data)
+        with self._mutation() as data:
+            if not _remove_record(data["accounts"], account_id):
+                raise ValidationError(f"Account '{account_id}' was not found.")
+            budgets = data["usage_budgets"]
+            budgets[:] = [budget for budget in budgets if budget["account_id"] != account_id]
+            recommendations = data["recommendations"]
+            if any(rec.get("account_id") == account_id for rec in recommendations):
+                recommendations[:] = [rec for rec in recommendations if rec.get("account_id") != account_id]
 
     def list_budgets(self) -> list[dict]:
         return self._read()["usage_budgets"]
 
     def get_budget(self, budget_id: str) -> dict | None:
-        budgets = self._read()["usage_budgets"]
-        return next((budget for budget in budgets if budget["id"] == budget_id), None)
+        return self.snapshot().budget_by_id.get(budget_id)
 
     def create_budget(self, payload: dict) -> dict:
-        data = self._read()
-        validate_budget_payload(payload, data["accounts"])
-        if any(budget["id"] == payload["id"] for budget in data["usage_budgets"]):
-            raise ValidationError(f"Budget '{payload['id']}' already exists.")
-        if any(budget["account_id"] == payload["account_id"] for budget in data["usage_budgets"]):
-            raise ValidationError(f"Account '{payload['account_id']}' already has a budget.")
-        data["usage_budgets"].append(payload)
-        self._write(data)
-        return payload
+        with self._mutation() as data:
+            validate_budget_payload(payload, self._known_ids(data, "accounts"))
+            if payload["id"] in self._known_ids(data, "usage_budgets"):
+                raise ValidationError(f"Budget '{payload['id']}' already exists.")
+            if payload["account_id"] in self._budgeted_account_ids(data):
+                raise ValidationError(f"Account '{payload['account_id']}' already has a budget.")
+            record = dict(payload)
+            data["usage_budgets"].append(record)
+        return record
 
     def update_budget(self, budget_id: str, payload: dict) -> dict:
-        data = self._read()
-        validate_budget_payload(payload, data["accounts"])
-        if payload["id"] != budget_id:
-            raise ValidationError("Budget ID in path and payload must match.")
-        budget = next((item for item in data["usage_budgets"] if item["id"] == budget_id), None)
-        if not budget:
-            raise ValidationError(f"Budget '{budget_id}' was not found.")
-        for existing in data["usage_budgets"]:
-            if existing["id"] != budget_id and existing["account_id"] == payload["account_id"]:
+        with self._mutation() as data:
+            validate_budget_payload(payload, self._known_ids(data, "accounts"))
+            if payload["id"] != budget_id:
+                raise ValidationError("Budget ID in path and payload must match.")
+            budgets = data["usage_budgets"]
+            target = None
+            account_taken = False
+            for index, existing in enumerate(budgets):
+                if existing["id"] == budget_id:
+                    target = index
+                elif existing["account_id"] == payload["account_id"]:
+                    account_taken = True
+            if target is None:
+                raise ValidationError(f"Budget '{budget_id}' was not found.")
+            if account_taken:
                 raise ValidationError(f"Account '{payload['account_id']}' already has a budget.")
-        budget.update(payload)
-        self._write(data)
+            budget = budgets[target] = {**budgets[target], **payload}
         return budget
 
     def delete_budget(self, budget_id: str) -> None:
-        data = self._read()
-        before = len(data["usage_budgets"])
-        data["usage_budgets"] = [budget for budget in data["usage_budgets"] if budget["id"] != budget_id]
-        if len(data["usage_budgets"]) == before:
-            raise ValidationError(f"Budget '{budget_id}' was not found.")
-        self._write(data)
+        with self._mutation() as data:
+            if not _remove_record(data["usage_budgets"], budget_id):
+                raise ValidationError(f"Budget '{budget_id}' was not found.")
 
     def list_recommendations(self) -> list[dict]:
-        return sorted(self._read()["recommendations"], key=lambda rec: rec["priority"])
+        return self.snapshot().recommendations_by_priority
 
     def get_recommendation(self, recommendation_id: str) -> dict | None:
-        recommendations = self._read()["recommendations"]
-        return next((rec for rec in recommendations if rec["id"] == recommendation_id), None)
+        return self.snapshot().recommendation_by_id.get(recommendation_id)
 
     def create_recommendation(self, payload: dict) -> dict:
-        data = self._read()
-        validate_recommendation_payload(payload, data["accounts"], data["services"])
-        if any(rec["id"] == payload["id"] for rec in data["recommendations"]):
-            raise ValidationError(f"Recommendation '{payload['id']}' already exists.")
-        data["recommendations"].append(payload)
-        self._write(data)
-        return payload
+        with self._mutation() as data:
+            validate_recommendation_payload(
+                payload, self._known_ids(data, "accounts"), self._known_ids(data, "services")
+            )
+            if payload["id"] in self._known_ids(data, "recommendations"):
+                raise ValidationError(f"Recommendation '{payload['id']}' already exists.")
+            record = dict(payload)
+            data["recommendations"].append(record)
+        return record
 
     def update_recommendation(self, recommendation_id: str, payload: dict) -> dict:
-        data = self._read()
-        validate_recommendation_payload(payload, data["accounts"], data["services"])
-        if payload["id"] != recommendation_id:
-            raise ValidationError("Recommendation ID in path and payload must match.")
-        recommendation = next(
-            (rec for rec in data["recommendations"] if rec["id"] == recommendation_id), None
-        )
-        if not recommendation:
-            raise ValidationError(f"Recommendation '{recommendation_id}' was not found.")
-        recommendation.update(payload)
-        self._write(data)
+        with self._mutation() as data:
+            validate_recommendation_payload(
+                payload, self._known_ids(data, "accounts"), self._known_ids(data, "services")
+            )
+            if payload["id"] != recommendation_id:
+                raise ValidationError("Recommendation ID in path and payload must match.")
+            recommendation = _replace_record(data["recommendations"], recommendation_id, payload)
+            if not recommendation:
+                raise ValidationError(f"Recommendation '{recommendation_id}' was not found.")
         return recommendation
 
     def delete_recommendation(self, recommendation_id: str) -> None:
-        data = self._read()
-        before = len(data["recommendations"])
-        data["recommendations"] = [
-            rec for rec in data["recommendations"] if rec["id"] != recommendation_id
-        ]
-        if len(data["recommendations"]) == before:
-            raise ValidationError(f"Recommendation '{recommendation_id}' was not found.")
-        self._write(data)
+        with self._mutation() as data:
+            if not _remove_record(data["recommendations"], recommendation_id):
+                raise ValidationError(f"Recommendation '{recommendation_id}' was not found.")
 
     def dashboard_summary(self) -> dict:
-        data = self._read()
-        service_by_id = {svc["id"]: svc for svc in data["services"]}
-        budgets_by_account_id = {
-            budget["account_id"]: budget for budget in data["usage_budgets"]
-        }
-        active_accounts = [acc for acc in data["accounts"] if acc["status"] == "active"]
-        total = round(sum(acc["monthly_cost_usd"] for acc in active_accounts), 2)
-        breakdown = {"coding": 0.0, "art": 0.0, "music": 0.0, "general": 0.0}
-        budget_alerts = []
-        for account in active_accounts:
-            category = service_by_id.get(account["service_id"], {}).get("category", "general")
-            breakdown[category] += account["monthly_cost_usd"]
-            budget = budgets_by_account_id.get(account["id"])
-            if budget and budget["monthly_budget_usd"] > 0:
-                percent = round((budget["current_month_spend_usd"] / budget["monthly_budget_usd"]) * 100, 2)
-                if percent >= budget["alert_threshold_percent"]:
-                    budget_alerts.append(
-                        {
-                            "account_id": account["id"],
-                            "email": account["email"],
-                            "percent_used": percent,
-                        }
-                    )
-        breakdown = {key: round(value, 2) for key, value in breakdown.items()}
-        return {
-            "total_monthly_spend_usd": total,
-            "category_breakdown_usd": breakdown,
-            "budget_alerts": budget_alerts,
-        }
+        return self.snapshot().summary
@@ -1,15 +1,28 @@
+import math
+from collections.abc import Container
+
 ALLOWED_CATEGORIES = {"coding", "art", "music", "general"}
 ALLOWED_STATUSES = {"active", "paused", "cancelled"}
 
+_REQUIRED_SERVICE_FIELDS = ("id", "name", "category", "provider", "website_url")
+_REQUIRED_ACCOUNT_FIELDS = ("id", "service_id", "email", "plan_name", "monthly_cost_usd", "status")
+_REQUIRED_BUDGET_FIELDS = ("id", "account_id", "monthly_budget_usd", "alert_threshold_percent", "current_month_spend_usd")
+_REQUIRED_RECOMMENDATION_FIELDS = ("id", "title", "body", "priority")
+
 
 class ValidationError(ValueError):
     pass
 
 
 def _reject_password_fields(payload: dict) -> None:
-    for key in payload:
-        if "password" in key.lower():
-            raise ValidationError("Password fields are not allowed.")
+    # One lowercase pass over all keys; "password" has no newline, so it cannot match across two keys.
+    if "password" in "\n".join(payload).lower():
+        raise ValidationError("Password fields are not allowed.")
+
+
+def _is_known(value, ids: Container[str]) -> bool:
+    # Ids are strings; anything else (lists, objects) is unhashable or simply unknown.
+    return isinstance(value, str) and value in ids
 
 
 def _require(payload: dict, field: str) -> None:
@@ -17,11 +30,16 @@ def _require(payload: dict, field: str) -> None:
         raise ValidationError(f"Missing required field '{field}'.")
 
 
+def _require_string_id(payload: dict) -> None:
+    if not isinstance(payload["id"], str):
+        raise ValidationError("Field 'id' must be a string.")
+
+
 def validate_service_payload(payload: dict) -> None:
     _reject_password_fields(payload)
-    required = ["id", "name", "category", "provider", "website_url"]
-    for field in required:
+    for field in _REQUIRED_SERVICE_FIELDS:
         _require(payload, field)
+    _require_string_id(payload)
 
     if payload["category"] not in ALLOWED_CATEGORIES:
         raise ValidationError(
@@ -34,11 +52,11 @@ def validate_service_payload(payload: dict) -> None:
             raise ValidationError(f"Field '{url_field}' must be a string or null.")
 
 
-def validate_account_payload(payload: dict, services: list[dict]) -> None:
+def validate_account_payload(payload: dict, service_ids: Container[str]) -> None:
     _reject_password_fields(payload)
-    required = ["id", "service_id", "email", "plan_name", "monthly_cost_usd", "status"]
-    for field in required:
+    for field in _REQUIRED_ACCOUNT_FIELDS:
         _require(payload, field)
+    _require_string_id(payload)
 
     if "@" not in payload["email"]:
         raise ValidationError("Field 'email' must look like an email address.")
@@ -48,11 +66,11 @@ def validate_account_payload(payload: dict, services: list[dict]) -> None:
             f"Invalid status '{payload['status']}'. Allowed: {sorted(ALLOWED_STATUSES)}."
         )
 
-    if not any(svc["id"] == payload["service_id"] for svc in services):
+    if not _is_known(payload["service_id"], service_ids):
         raise ValidationError(f"Unknown service_id '{payload['service_id']}'.")
 
     monthly_cost = payload["monthly_cost_usd"]
-    if not isinstance(monthly_cost, (int, float)) or monthly_cost < 0:
+    if not isinstance(monthly_cost, (int, float)) or not math.isfinite(monthly_cost) or monthly_cost < 0:
         raise ValidationError("Field 'monthly_cost_usd' must be a non-negative number.")
 
     renewal_day = payload.get("renewal_day")
@@ -65,38 +83,40 @@ def validate_account_payload(payload: dict, services: list[dict]) -> None:
             raise ValidationError("Field 'tags' must be a list of strings.")
 
 
-def validate_budget_payload(payload: dict, accounts: list[dict]) -> None:
+def validate_budget_payload(payload: dict, account_ids: Container[str]) -> None:
     _reject_password_fields(payload)
-    required = ["id", "account_id", "monthly_budget_usd", "alert_threshold_percent", "current_month_spend_usd"]
-    for field in required:
+    for field in _REQUIRED_BUDGET_FIELDS:
         _require(payload, field)
+    _require_string_id(payload)
 
-    if not any(acc["id"] == payload["account_id"] for acc in accounts):
+    if not _is_known(payload["account_id"], account_ids):
         raise ValidationError(f"Unknown account_id '{payload['account_id']}'.")
 
     for number_field in ("monthly_budget_usd", "alert_threshold_percent", "current_month_spend_usd"):
         value = payload[number_field]
-        if not isinstance(value, (int, float)) or value < 0:
+        if not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
             raise ValidationError(f"Field '{number_field}' must be a non-negative number.")
 
     if payload["alert_threshold_percent"] > 100:
         raise ValidationError("Field 'alert_threshold_percent' cannot be greater than 100.")
 
 
-def validate_recommendation_payload(payload: dict, accounts: list[dict], services: list[dict]) -> None:
+def validate_recommendation_payload(
+    payload: dict, account_ids: Container[str], service_ids: Container[str]
+) -> None:
     _reject_password_fields(payload)
-    required = ["id", "title", "body", "priority"]
-    for field in required:
+    for field in _REQUIRED_RECOMMENDATION_FIELDS:
         _require(payload, field)
+    _require_string_id(payload)
 
     account_id = payload.get("account_id")
     service_id = payload.get("service_id")
     if not account_id and not service_id:
         raise ValidationError("Recommendation requires either 'account_id' or 'service_id'.")
 
-    if account_id and not any(acc["id"] == account_id for acc in accounts):
+    if account_id and not _is_known(account_id, account_ids):
         raise ValidationError(f"Unknown account_id '{account_id}'.")
-    if service_id and not any(svc["id"] == service_id for svc in services):
+    if service_id and not _is_known(service_id, service_ids):
         raise ValidationError(f"Unknown service_id '{service_id}'.")
 
     if not isinstance(payload["priority"], int) or payload["priority"] < 1 or payload["priority"] > 5:
@@ -1,12 +1,15 @@
 import json
+import os
 import tempfile
 import unittest
+from types import MappingProxyType
+from unittest import mock
 
 from ai_watch import create_app
 
 
-def sample_service() -> dict:
-    return {
+_SERVICE = MappingProxyType(
+    {
         "id": "claude_code_pro",
         "name": "Claude Code Pro",
         "category": "coding",
@@ -15,10 +18,15 @@ def sample_service() -> dict:
         "docs_url": "https://docs.anthropic.com",
         "billing_url": "https://claude.ai/settings/billing",
     }
+)
 
 
-def sample_account() -> dict:
-    return {
+def sample_service(**overrides) -> dict:
+    return {**_SERVICE, **overrides}
+
+
+_ACCOUNT = MappingProxyType(
+    {
         "id": "acc_77",
         "service_id": "claude_code_pro",
         "email": "builder@example.com",
@@ -27,22 +35,32 @@ def sample_account() -> dict:
         "renewal_day": 10,
         "status": "active",
         "notes": "Repo scale edits",
-        "tags": ["coding", "deep_repo"],
+        "tags": ("coding", "deep_repo"),
     }
+)
+
+
+def sample_account(**overrides) -> dict:
+    return {**_ACCOUNT, "tags": list(_ACCOUNT["tags"]), **overrides}
 
 
-def sample_budget() -> dict:
-    return {
+_BUDGET = MappingProxyType(
+    {
         "id": "bud_77",
         "account_id": "acc_77",
         "monthly_budget_usd": 30.0,
         "alert_threshold_percent": 80.0,
         "current_month_spend_usd": 26.0,
     }
+)
 
 
-def sample_recommendation() -> dict:
-    return {
+def sample_budget(**overrides) -> dict:
+    return {**_BUDGET, **overrides}
+
+
+_RECOMMENDATION = MappingProxyType(
+    {
         "id": "rec_77",
         "account_id": "acc_77",
         "service_id": None,
@@ -50,12 +68,20 @@ def sample_recommendation() -> dict:
         "body": "Use this account for multi-file edits.",
         "priority": 1,
     }
+)
+
+
+def sample_recommendation(**overrides) -> dict:
+    return {**_RECOMMENDATION, **overrides}
 
 
 class ApiTests(unittest.TestCase):
     def setUp(self):
+        env = mock.patch.dict(os.environ, {"AI_WATCH_NO_FSYNC": "1"})
+        env.start()
+        self.addCleanup(env.stop)
         self.temp_dir = tempfile.TemporaryDirectory()
-        db_path = f"{self.temp_dir.name}\\db.json"
+        db_path = os.path.join(self.temp_dir.name, "db.json")
         self.app = create_app(db_path)
         self.client = self.app.test_client()
 
@@ -67,6 +93,22 @@ class ApiTests(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.get_json(), {"status": "ok"})
 
+    def test_app_starts_when_database_cannot_be_prewarmed(self):
+        missing_status = {key: value for key, value in sample_account().items() if key != "status"}
+        for name, config in (
+            ("empty.json", {}),
+            ("missing_field.json", {"services": [sample_service()], "accounts": [missing_status]}),
+        ):
+            with self.subTest(name=name):
+                db_path = os.path.join(self.temp_dir.name, name)
+                with open(db_path, "w", encoding="utf-8") as handle:
+                    json.dump(config, handle)
+
+                with self.assertLogs(level="ERROR"):
+                    app = create_app(db_path)
+
+                self.assertEqual(app.test_client().get("/api/health").status_code, 200)
+
     def test_create_service_and_account_then_fetch_dashboard(self):
         service_response = self.client.post("/api/services", json=sample_service())
         account_response = self.client.post("/api/accounts", json=sample_account())
@@ -79,10 +121,75 @@ class ApiTests(unittest.TestCase):
         self.assertEqual(dashboard["total_monthly_spend_usd"], 17.0)
         self.assertEqual(dashboard["category_breakdown_usd"]["coding"], 17.0)
 
+    def test_dashboard_reflects_writes_after_cached_read(self):
+        self.client.post("/api/services", json=sample_service())
+        self.client.post("/api/accounts", json=sample_account())
+        self.assertEqual(self.client.get("/api/dashboard").get_json()["total_monthly_spend_usd"], 17.0)
+
+        updated = sample_account(monthly_cost_usd=19.0)
+        self.client.put("/api/accounts/acc_77", json=updated)
+
+        dashboard = self.client.get("/api/dashboard").get_json()
+        self.assertEqual(dashboard["total_monthly_spend_usd"], 19.0)
+
+    def test_home_ignores_query_string_for_page_cache(self):
+        self.client.post("/api/services", json=sample_service())
+        for index in range(70):
+            self.client.get(f"/?x={index}")
+            self.client.get(f"/crud?x={index}")
+            self.client.get(f"/crud?edit_service_id=missing_{index}")
+            self.client.get(f"/api/services?category=junk{index}")
+        self.client.get("/crud?category=coding")
+
+        with mock.patch("ai_watch.routes.render_template") as render:
+            self.client.get("/crud?category=coding")
+            self.client.get("/?x=999")
+        render.assert_not_called()
+
+    def test_dashboard_returns_not_modified_for_matching_etag(self):
+        first = self.client.get("/api/dashboard")
+        etag = first.headers["ETag"]
+
+        cached = self.client.get("/api/dashboard", headers={"If-None-Match": etag})
+        self.assertEqual(cached.status_code, 304)
+
+        self.client.post("/api/services", json=sample_service())
+        changed = self.client.get("/api/dashboard", headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["ETag"], etag)
+
+    def test_etag_matches_across_workers_and_keeps_encoding_suffix(self):
+        self.client.post("/api/services", json=sample_service())
+        self.client.post("/api/accounts", json=sample_account())
+        self.client.post("/api/budgets", json=sample_budget())
+        self.client.post("/api/recommendations", json=sample_recommendation())
+        first = self.client.get("/api/config", headers={"Accept-Encoding": "gzip"})
+        etag = first.headers["ETag"]
+        self.assertIn(":gzip", etag)
+
+        other_worker = create_app(self.app.config["DB"].path).test_client()
+        cached = other_worker.get("/api/config", headers={"If-None-Match": etag, "Accept-Encoding": "gzip"})
+
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.headers["ETag"], etag)
+
+    def test_large_json_response_is_compressed(self):
+        self.client.post("/api/services", json=sample_service())
+        self.client.post("/api/accounts", json=sample_account())
+        self.client.post("/api/budgets", json=sample_budget())
+        self.client.post("/api/recommendations", json=sample_recommendation())
+
+        response = self.client.get("/api/config", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+
+        etag = response.headers["ETag"]
+        cached = self.client.get("/api/config", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        self.assertEqual(cached.status_code, 304)
+
     def test_filter_accounts_by_status(self):
         self.client.post("/api/services", json=sample_service())
         self.client.post("/api/accounts", json=sample_account())
-        paused = {**sample_account(), "id": "acc_88", "status": "paused"}
+        paused = sample_account(id="acc_88", status="paused")
         self.client.post("/api/accounts", json=paused)
 
         response = self.client.get("/api/accounts?status=active")
@@ -90,13 +197,37 @@ class ApiTests(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.get_json()), 1)
 
+    def test_rejects_non_string_references(self):
+        self.client.post("/api/services", json=sample_service())
+        self.client.post("/api/accounts", json=sample_account())
+        for url, payload in (
+            ("/api/accounts", sample_account(id="acc_2", service_id=["claude_code_pro"])),
+            ("/api/budgets", sample_budget(account_id={"id": "acc_77"})),
+            ("/api/recommendations", sample_recommendation(account_id=["acc_77"])),
+        ):
+            with self.subTest(url=url):
+                response = self.client.post(url, json=payload)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("Unknown", response.get_json()["error"])
+
+    def test_rejects_non_string_id(self):
+        response = self.client.post("/api/services", json=sample_service(id=["claude_code_pro"]))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["error"], "Field 'id' must be a string.")
+
     def test_reject_password_field_from_api(self):
-        bad_payload = {**sample_service(), "password": "not-allowed"}
+        bad_payload = sample_service(password="not-allowed")
         response = self.client.post("/api/services", json=bad_payload)
 
         self.assertEqual(response.status_code, 400)
         self.assertIn("Password fields are not allowed.", response.get_json()["error"])
 
+    def test_rejects_malformed_json_body(self):
+        response = self.client.post("/api/services", data="{not json", content_type="application/json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Invalid JSON", response.get_json()["error"])
+
     def test_not_found_for_missing_service(self):
         response = self.client.get("/api/services/does-not-exist")
         self.assertEqual(response.status_code, 404)
@@ -124,6 +255,13 @@ class ApiTests(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn("CRUD Workspace", response.get_data(as_text=True))
 
+    def test_crud_page_shows_new_service_after_cached_render(self):
+        self.assertNotIn("Claude Code Pro", self.client.get("/crud").get_data(as_text=True))
+
+        self.client.post("/api/services", json=sample_service())
+
+        self.assertIn("Claude Code Pro", self.client.get("/crud").get_data(as_text=True))
+
     def test_budget_and_recommendation_api_flow(self):
         self.client.post("/api/services", json=sample_service())
         self.client.post("/api/accounts", json=sample_account())
@@ -211,6 +349,40 @@ class ApiTests(unittest.TestCase):
         self.assertEqual(payload["email"], "updated@example.com")
         self.assertEqual(payload["status"], "paused")
 
+    def test_web_form_rejects_non_finite_cost(self):
+        self.client.post("/api/services", json=sample_service())
+        response = self.client.post(
+            "/accounts/save",
+            data={
+                "id": "acc_900",
+                "service_id": "claude_code_pro",
+                "email": "a@example.com",
+                "plan_name": "Pro",
+                "monthly_cost_usd": "nan",
+                "renewal_day": "",
+                "status": "active",
+                "notes": "",
+                "tags": "",
+                "edit_id": "",
+            },
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get("/api/accounts/acc_900").status_code, 404)
+
+    def test_import_repairs_malformed_database(self):
+        missing_status = {key: value for key, value in sample_account().items() if key != "status"}
+        db_path = os.path.join(self.temp_dir.name, "malformed.json")
+        with open(db_path, "w", encoding="utf-8") as handle:
+            json.dump({"services": [sample_service()], "accounts": [missing_status]}, handle)
+        with self.assertLogs(level="ERROR"):
+            client = create_app(db_path).test_client()
+
+        fixed = {"services": [sample_service()], "accounts": [sample_account()]}
+        response = client.post("/config/import", data={"config_json": json.dumps(fixed)})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(client.get("/api/dashboard").get_json()["total_monthly_spend_usd"], 17.0)
+
     def test_import_config_from_web(self):
         payload = {
             "services": [sample_service()],
@@ -1,14 +1,19 @@
 import json
+import math
+import os
 import tempfile
+import threading
 import unittest
 from pathlib import Path
+from types import MappingProxyType
+from unittest import mock
 
 from ai_watch.storage import FileDatabase
 from ai_watch.validation import ValidationError
 
 
-def sample_service() -> dict:
-    return {
+_SERVICE = MappingProxyType(
+    {
         "id": "chatgpt_plus",
         "name": "ChatGPT Plus",
         "category": "general",
@@ -17,10 +22,15 @@ def sample_service() -> dict:
         "docs_url": "https://platform.openai.com/docs",
         "billing_url": "https://platform.openai.com/settings/billing",
     }
+)
 
 
-def sample_account() -> dict:
-    return {
+def sample_service(**overrides) -> dict:
+    return {**_SERVICE, **overrides}
+
+
+_ACCOUNT = MappingProxyType(
+    {
         "id": "acc_1",
         "service_id": "chatgpt_plus",
         "email": "owner@example.com",
@@ -29,22 +39,32 @@ def sample_account() -> dict:
         "renewal_day": 3,
         "status": "active",
         "notes": "Primary prompt service.",
-        "tags": ["general", "prompt_engineer"],
+        "tags": ("general", "prompt_engineer"),
     }
+)
+
 
+def sample_account(**overrides) -> dict:
+    return {**_ACCOUNT, "tags": list(_ACCOUNT["tags"]), **overrides}
 
-def sample_budget() -> dict:
-    return {
+
+_BUDGET = MappingProxyType(
+    {
         "id": "bud_1",
         "account_id": "acc_1",
         "monthly_budget_usd": 30.0,
         "alert_threshold_percent": 80.0,
         "current_month_spend_usd": 25.0,
     }
+)
+
+
+def sample_budget(**overrides) -> dict:
+    return {**_BUDGET, **overrides}
 
 
-def sample_recommendation() -> dict:
-    return {
+_RECOMMENDATION = MappingProxyType(
+    {
         "id": "rec_1",
         "account_id": "acc_1",
         "service_id": None,
@@ -52,16 +72,31 @@ def sample_recommendation() -> dict:
         "body": "Use this for deep coding sessions.",
         "priority": 1,
     }
+)
+
+
+def sample_recommendation(**overrides) -> dict:
+    return {**_RECOMMENDATION, **overrides}
 
 
 class FileDatabaseTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.temp_dir.cleanup()
+
     def setUp(self):
-        self.temp_dir = tempfile.TemporaryDirectory()
-        self.db_path = Path(self.temp_dir.name) / "db.json"
-        self.db = FileDatabase(self.db_path)
+        # One directory for the class; each test gets its own database file in it.
+        self.db_path = Path(self.temp_dir.name) / f"{self._testMethodName}.json"
+        self.db = FileDatabase(self.db_path, durable=False)
 
-    def tearDown(self):
-        self.temp_dir.cleanup()
+    def seed_account(self):
+        with self.db.batch():
+            self.db.create_service(sample_service())
+            self.db.create_account(sample_account())
 
     def test_initializes_file_with_expected_shape(self):
         with self.db_path.open("r", encoding="utf-8") as handle:
@@ -71,11 +106,138 @@ class FileDatabaseTests(unittest.TestCase):
             {"services": [], "accounts": [], "usage_budgets": [], "recommendations": []},
         )
 
+    def test_reads_share_parsed_data_until_next_write(self):
+        first = self.db.get_config()
+        self.assertIs(self.db.get_config(), first)
+
+        self.db.create_service(sample_service())
+
+        self.assertIsNot(self.db.get_config(), first)
+        self.assertEqual(first["services"], [])
+
+    def test_reloads_when_file_changes_outside_instance(self):
+        self.db.create_service(sample_service())
+        self.assertEqual(len(self.db.list_services()), 1)
+
+        other = FileDatabase(self.db_path)
+        other.delete_service("chatgpt_plus")
+
+        self.assertEqual(self.db.list_services(), [])
+
+    def test_reads_do_not_wait_for_writer(self):
+        self.db.create_service(sample_service())
+        in_batch = threading.Event()
+        release = threading.Event()
+
+        def hold_write_lock():
+            with self.db.batch():
+                self.db.create_account(sample_account())
+                in_batch.set()
+                release.wait(5)
+
+        writer = threading.Thread(target=hold_write_lock)
+        writer.start()
+        try:
+            self.assertTrue(in_batch.wait(5))
+            self.assertEqual(self.db.get_service("chatgpt_plus")["name"], "ChatGPT Plus")
+            self.assertEqual(self.db.list_accounts(), [])
+        finally:
+            release.set()
+            writer.join(5)
+        self.assertEqual(len(self.db.list_accounts()), 1)
+
+    def test_reads_legacy_file_with_non_finite_numbers(self):
+        legacy = {"services": [sample_service()], "accounts": [sample_account(monthly_cost_usd=float("nan"))]}
+        self.db_path.write_text(json.dumps(legacy), encoding="utf-8")
+        db = FileDatabase(self.db_path, durable=False)
+
+        self.assertEqual(len(db.list_accounts()), 1)
+        db.create_service(sample_service(id="other"))
+
+        with self.db_path.open("r", encoding="utf-8") as handle:
+            payload = json.load(handle)
+        self.assertTrue(math.isnan(payload["accounts"][0]["monthly_cost_usd"]))
+        self.assertEqual(len(payload["services"]), 2)
+
+    def test_replace_by_other_writer_right_after_write_is_reloaded(self):
+        real_replace = os.replace
+        other_path = self.db_path.with_name(f"{self.db_path.stem}.other")
+
+        def replace_then_overwrite(src, dst):
+            real_replace(src, dst)
+            other_path.write_text(json.dumps({"services": [], "accounts": []}), encoding="utf-8")
+            real_replace(other_path, dst)
+
+        with mock.patch("ai_watch.storage.os.replace", side_effect=replace_then_overwrite):
+            self.db.create_service(sample_service())
+
+        self.assertEqual(self.db.list_services(), [])
+
+    def test_write_keeps_extra_top_level_keys(self):
+        extra = {"note": "hello", "meta": {"owner": "me"}, "schema": 2}
+        self.db_path.write_text(json.dumps({**self.db.get_config(), **extra}), encoding="utf-8")
+
+        self.db.create_service(sample_service())
+
+        with self.db_path.open("r", encoding="utf-8") as handle:
+            payload = json.load(handle)
+        self.assertEqual({key: payload[key] for key in extra}, extra)
+
+    def test_batch_writes_file_once_on_exit(self):
+        with self.db.batch():
+            self.db.create_service(sample_service())
+            self.db.create_account(sample_account())
+            with self.db_path.open("r", encoding="utf-8") as handle:
+                self.assertEqual(json.load(handle)["services"], [])
+
+        with self.db_path.open("r", encoding="utf-8") as handle:
+            payload = json.load(handle)
+        self.assertEqual(len(payload["services"]), 1)
+        self.assertEqual(len(payload["accounts"]), 1)
+
+    def test_batch_discards_changes_when_block_raises(self):
+        self.db.create_service(sample_service())
+
+        with self.assertRaises(ValidationError):
+            with self.db.batch():
+                self.db.create_account(sample_account())
+                self.db.create_account(sample_account())
+
+        self.assertEqual(self.db.list_accounts(), [])
+        with self.db_path.open("r", encoding="utf-8") as handle:
+            self.assertEqual(json.load(handle)["accounts"], [])
+
+    def test_failed_write_keeps_file_and_removes_temp_file(self):
+        self.db.create_service(sample_service())
+        unserializable = sample_service(id="other", extra=object())
+
+        with self.assertRaises(TypeError):
+            self.db.create_service(unserializable)
+
+        self.assertEqual([svc["id"] for svc in self.db.list_services()], ["chatgpt_plus"])
+        self.assertEqual(list(self.db_path.parent.glob(f".{self.db_path.name}.*.tmp")), [])
+
+    def test_fsync_only_when_durable(self):
+        with mock.patch("ai_watch.storage.os.fsync") as fsync:
+            self.db.create_service(sample_service())
+            fsync.assert_not_called()
+
+            FileDatabase(self.db_path).delete_service("chatgpt_plus")
+            fsync.assert_called_once()
+
     def test_create_and_get_service(self):
         created = self.db.create_service(sample_service())
         found = self.db.get_service(created["id"])
         self.assertEqual(found, created)
 
+    def test_service_index_refreshes_after_write(self):
+        self.db.create_service(sample_service())
+        self.assertEqual(self.db.snapshot().service_by_id["chatgpt_plus"]["name"], "ChatGPT Plus")
+
+        self.db.update_service("chatgpt_plus", sample_service(name="ChatGPT Pro"))
+
+        self.assertEqual(self.db.snapshot().service_by_id["chatgpt_plus"]["name"], "ChatGPT Pro")
+
     def test_rejects_duplicate_service_id(self):
         self.db.create_service(sample_service())
         with self.assertRaises(ValidationError):
@@ -84,7 +246,7 @@ class FileDatabaseTests(unittest.TestCase):
     def test_create_and_filter_accounts(self):
         self.db.create_service(sample_service())
         active = sample_account()
-        paused = {**sample_account(), "id": "acc_2", "status": "paused"}
+        paused = sample_account(id="acc_2", status="paused")
         self.db.create_account(active)
         self.db.create_account(paused)
 
@@ -95,11 +257,15 @@ class FileDatabaseTests(unittest.TestCase):
         self.assertEqual(len(all_accounts), 2)
         self.assertEqual(len(active_accounts), 1)
         self.assertEqual(len(general_accounts), 2)
+        self.assertEqual(
+            [acc["id"] for acc in self.db.list_accounts(category="general", status="paused")],
+            ["acc_2"],
+        )
+        self.assertEqual(self.db.list_accounts(category="coding", status="active"), [])
 
     def test_dashboard_summary_uses_active_accounts_only(self):
-        self.db.create_service(sample_service())
-        self.db.create_account(sample_account())
-        paused = {**sample_account(), "id": "acc_2", "status": "paused", "monthly_cost_usd": 50.0}
+        self.seed_account()
+        paused = sample_account(id="acc_2", status="paused", monthly_cost_usd=50.0)
         self.db.create_account(paused)
 
         summary = self.db.dashboard_summary()
@@ -108,34 +274,79 @@ class FileDatabaseTests(unittest.TestCase):
         self.assertEqual(summary["category_breakdown_usd"]["general"], 20.0)
 
     def test_rejects_password_fields(self):
-        bad_service = {**sample_service(), "password_hint": "secret"}
+        bad_service = sample_service(password_hint="secret")
         with self.assertRaises(ValidationError):
             self.db.create_service(bad_service)
+        with self.assertRaises(ValidationError):
+            self.db.create_service(sample_service(Admin_PASSWORD="secret"))
+
+    def test_rejects_non_finite_numbers(self):
+        self.seed_account()
+        with self.assertRaises(ValidationError):
+            self.db.update_account("acc_1", sample_account(monthly_cost_usd=float("nan")))
+        with self.assertRaises(ValidationError):
+            self.db.create_budget(sample_budget(monthly_budget_usd=float("inf")))
 
     def test_rejects_unknown_service_on_account(self):
         with self.assertRaises(ValidationError):
             self.db.create_account(sample_account())
 
     def test_delete_service_restricted_when_accounts_exist(self):
-        self.db.create_service(sample_service())
-        self.db.create_account(sample_account())
+        self.seed_account()
         with self.assertRaises(ValidationError):
             self.db.delete_service("chatgpt_plus")
 
     def test_update_account(self):
-        self.db.create_service(sample_service())
-        self.db.create_account(sample_account())
-        updated = {**sample_account(), "monthly_cost_usd": 22.0}
+        self.seed_account()
+        updated = sample_account(monthly_cost_usd=22.0)
         self.db.update_account("acc_1", updated)
         found = self.db.get_account("acc_1")
         self.assertEqual(found["monthly_cost_usd"], 22.0)
 
+    def test_delete_account_removes_its_budget_and_recommendations(self):
+        self.seed_account()
+        self.db.create_account(sample_account(id="acc_2"))
+        self.db.create_budget(sample_budget())
+        self.db.create_recommendation(sample_recommendation())
+        self.db.create_recommendation(sample_recommendation(id="rec_2", account_id="acc_2"))
+
+        self.db.delete_account("acc_1")
+
+        self.assertEqual([acc["id"] for acc in self.db.list_accounts()], ["acc_2"])
+        self.assertEqual(self.db.list_budgets(), [])
+        self.assertEqual([rec["id"] for rec in self.db.list_recommendations()], ["rec_2"])
+        with self.assertRaises(ValidationError):
+            self.db.delete_account("acc_1")
+
+    def test_delete_account_removes_every_budget_in_hand_edited_file(self):
+        duplicated = {
+            "services": [sample_service()],
+            "accounts": [sample_account(), sample_account()],
+            "usage_budgets": [sample_budget(), sample_budget(id="bud_2")],
+            "recommendations": [],
+        }
+        self.db_path.write_text(json.dumps(duplicated), encoding="utf-8")
+
+        self.db.delete_account("acc_1")
+
+        self.assertEqual(self.db.list_accounts(), [])
+        self.assertEqual(self.db.list_budgets(), [])
+
+    def test_delete_account_works_on_malformed_record(self):
+        missing_status = {key: value for key, value in sample_account().items() if key != "status"}
+        self.db_path.write_text(
+            json.dumps({"services": [sample_service()], "accounts": [missing_status]}), encoding="utf-8"
+        )
+
+        self.db.delete_account("acc_1")
+
+        self.assertEqual(self.db.list_accounts(), [])
+
     def test_create_update_budget_and_budget_alert(self):
-        self.db.create_service(sample_service())
-        self.db.create_account(sample_account())
+        self.seed_account()
         self.db.create_budget(sample_budget())
 
-        updated = {**sample_budget(), "current_month_spend_usd": 28.0}
+        updated = sample_budget(current_month_spend_usd=28.0)
         self.db.update_budget("bud_1", updated)
         found = self.db.get_budget("bud_1")
         self.assertEqual(found["current_month_spend_usd"], 28.0)
@@ -144,22 +355,43 @@ class FileDatabaseTests(unittest.TestCase):
         self.assertEqual(len(summary["budget_alerts"]), 1)
         self.assertEqual(summary["budget_alerts"][0]["account_id"], "acc_1")
 
+    def test_rejects_second_budget_for_account_in_and_out_of_batch(self):
+        self.seed_account()
+        self.db.create_budget(sample_budget())
+        with self.assertRaises(ValidationError):
+            self.db.create_budget(sample_budget(id="bud_2"))
+
+        with self.assertRaises(ValidationError):
+            with self.db.batch():
+                self.db.create_account(sample_account(id="acc_2"))
+                self.db.create_budget(sample_budget(id="bud_2", account_id="acc_2"))
+                self.db.create_budget(sample_budget(id="bud_3", account_id="acc_2"))
+        self.assertEqual([budget["id"] for budget in self.db.list_budgets()], ["bud_1"])
+
     def test_rejects_budget_when_account_missing(self):
         with self.assertRaises(ValidationError):
             self.db.create_budget(sample_budget())
 
     def test_create_and_list_recommendations(self):
-        self.db.create_service(sample_service())
-        self.db.create_account(sample_account())
+        self.seed_account()
         self.db.create_recommendation(sample_recommendation())
         recs = self.db.list_recommendations()
         self.assertEqual(len(recs), 1)
         self.assertEqual(recs[0]["id"], "rec_1")
 
+    def test_recommendations_listed_by_priority_after_update(self):
+        self.seed_account()
+        self.db.create_recommendation(sample_recommendation(priority=3))
+        self.db.create_recommendation(sample_recommendation(id="rec_2", priority=2))
+        self.assertEqual([rec["id"] for rec in self.db.list_recommendations()], ["rec_2", "rec_1"])
+
+        self.db.update_recommendation("rec_1", sample_recommendation(priority=1))
+
+        self.assertEqual([rec["id"] for rec in self.db.list_recommendations()], ["rec_1", "rec_2"])
+
     def test_recommendation_requires_target(self):
-        self.db.create_service(sample_service())
-        self.db.create_account(sample_account())
-        payload = {**sample_recommendation(), "account_id": None, "service_id": None}
+        self.seed_account()
+        payload = sample_recommendation(account_id=None, service_id=None)
         with self.assertRaises(ValidationError):
             self.db.create_recommendation(payload)
 
@@ -170,7 +402,9 @@ class FileDatabaseTests(unittest.TestCase):
             "usage_budgets": [sample_budget()],
             "recommendations": [sample_recommendation()],
         }
-        self.db.replace_config(payload)
+        with mock.patch("ai_watch.storage.os.replace", wraps=os.replace) as replace:
+            self.db.replace_config(payload)
+        replace.assert_called_once()
         summary = self.db.dashboard_summary()
         self.assertEqual(summary["total_monthly_spend_usd"], 20.0)
         self.assertEqual(len(self.db.list_recommendations()), 1)